@@ -0,0 +1,73 @@
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def _kahan_add(total, compensation, value):
+    """Adds `value` to a Kahan-compensated sum, the same way pandas' rolling sum does."""
+    y = value - compensation
+    t = total + y
+    compensation = (t - total) - y
+    return t, compensation
+
+
+@njit(cache=True)
+def window_stats(group_codes, ts_ns, amount, window_ns, include_ties):
+    """
+    Counts and sums the transactions in a trailing time window, in a single pass.
+
+    The window for row i covers the rows of the same group with a timestamp in
+    [ts_ns[i] - window_ns, ts_ns[i]]. Rows must be sorted by group and then by time.
+
+    :param group_codes: Integer group code for each row (e.g. the user or merchant)
+    :param ts_ns: Timestamps as int64 nanoseconds
+    :param amount: Transaction amounts as float64
+    :param window_ns: Window length in nanoseconds
+    :param include_ties: Whether later rows with the same timestamp also count towards the window
+    :return: Arrays with the transaction count and the amount sum of each row's window
+    """
+    n = len(ts_ns)
+    counts = np.empty(n, dtype=np.int64)
+    sums = np.empty(n, dtype=np.float64)
+
+    left = 0  # First row inside the window
+    right = 0  # One past the last row added to the running sum
+    end = 0  # One past the last row in the current window
+    running = 0.0
+    compensation = 0.0
+    for i in range(n):
+        # Start over at every group boundary
+        if i == 0 or group_codes[i] != group_codes[i - 1]:
+            left = i
+            right = i
+            running = 0.0
+            compensation = 0.0
+
+        # Drop rows that have fallen out of the window. If none of the summed rows are left,
+        # restart the sum so earlier rounding errors don't carry over.
+        new_left = left
+        while ts_ns[i] - ts_ns[new_left] > window_ns:
+            new_left += 1
+        if new_left >= right:
+            running = 0.0
+            compensation = 0.0
+        else:
+            for j in range(left, new_left):
+                running, compensation = _kahan_add(running, compensation, -amount[j])
+        left = new_left
+
+        # Find where the window ends, optionally taking in the rest of a timestamp tie.
+        # Rows inside a tie that was already scanned share its end.
+        if end <= i:
+            end = i + 1
+            if include_ties:
+                while end < n and group_codes[end] == group_codes[i] and ts_ns[end] == ts_ns[i]:
+                    end += 1
+        while right < end:
+            running, compensation = _kahan_add(running, compensation, amount[right])
+            right += 1
+
+        counts[i] = end - left
+        sums[i] = running
+
+    return counts, sums
@@ -10,7 +10,17 @@ from app.fraud_rules import (
     RapidFireTransactionRule,
     CreditLimitRule,
 )
-import uuid
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Columns every rule relies on
+REQUIRED_COLUMNS = ("user_id", "timestamp", "amount", "merchant_name")
+
+
+class InvalidTransactionsError(ValueError):
+    """Raised when a batch of transactions can't be checked, e.g. because columns are missing."""
 
 
 class FraudDetector:
@@ -29,43 +39,96 @@ class FraudDetector:
             CreditLimitRule(),
         ]
 
+        # Resolve each rule's name and check once, instead of on every request
+        self.rule_names = np.array([rule.__class__.__name__ for rule in self.rules])
+        self.rule_checks = [rule.check_mask for rule in self.rules]
+
     def detect_fraud(self, transactions: pd.DataFrame) -> pd.DataFrame:
         """
         Applies all fraud detection rules to a set of transactions and flags suspicious ones.
 
         :param transactions: A Pandas DataFrame containing transaction data
         :return: A DataFrame of flagged suspicious transactions, with the reasons for flags
+        :raises InvalidTransactionsError: If required columns are missing or timestamps are missing or invalid
         """
-        flagged_transaction_map = {}  # Keeps track of transaction IDs and the reasons they were flagged
+        # Check the columns once up front rather than failing somewhere inside a rule
+        missing_columns = [column for column in REQUIRED_COLUMNS if column not in transactions.columns]
+        if missing_columns:
+            raise InvalidTransactionsError(f"Missing required columns: {', '.join(missing_columns)}")
 
         # If the transactions don't already have a unique transaction ID, generate one
         if "transaction_id" not in transactions.columns:
-            transactions["transaction_id"] = [str(uuid.uuid4()) for _ in range(len(transactions))]
+            # One urandom read for the whole batch, cut into 128-bit hex IDs
+            random_hex = os.urandom(16 * len(transactions)).hex()
+            transactions["transaction_id"] = [random_hex[i:i + 32] for i in range(0, len(random_hex), 32)]
+
+        # Nothing to flag, so skip the preprocessing and the rules entirely
+        if transactions.empty:
+            return transactions.assign(fraud_reasons=[]).reset_index(drop=True)
+
+        # Work on a copy from here on, so the caller's frame only gains the transaction IDs. Its index
+        # is renumbered by position, so the input order can be restored afterwards whatever index
+        # the caller's frame had.
+        transactions = transactions.reset_index(drop=True)
 
-        # Fill any missing data with "Unknown" to avoid errors during rule checks
-        transactions.fillna("Unknown", inplace=True)
+        # Fill any missing text with "Unknown" to avoid errors during rule checks. Amounts are kept
+        # numeric (missing ones count as 0) so the rules don't fall back to slow object comparisons.
+        text_cols = transactions.select_dtypes(include=["object", "string"]).columns
+        transactions[text_cols] = transactions[text_cols].fillna("Unknown")
+        transactions["amount"] = pd.to_numeric(transactions["amount"], errors="coerce").fillna(0.0)
+
+        # User IDs and merchant names are keys for the rules, so they get "Unknown" even when the
+        # column isn't text (e.g. numeric user IDs with blanks); every row then has a real category
+        key_cols = ["user_id", "merchant_name"]
+        transactions[key_cols] = transactions[key_cols].fillna("Unknown")
+
+        # Store user IDs and merchant names as categories, so the rules group and look them up
+        # through integer codes instead of hashing the strings again
+        transactions["user_id"] = transactions["user_id"].astype("category")
+        transactions["merchant_name"] = transactions["merchant_name"].astype("category")
+
+        # Parse timestamps and sort by user and time once, so the rules don't each redo it.
+        # ISO 8601 timestamps take the fast path; anything else falls back to format inference.
+        try:
+            transactions["timestamp"] = pd.to_datetime(transactions["timestamp"], format="ISO8601")
+        except (ValueError, TypeError):
+            try:
+                transactions["timestamp"] = pd.to_datetime(transactions["timestamp"])
+            except (ValueError, TypeError):
+                raise InvalidTransactionsError("Transactions have missing or invalid timestamps") from None
+        if transactions["timestamp"].isna().any():
+            raise InvalidTransactionsError("Transactions have missing or invalid timestamps")
+        transactions = transactions.sort_values(by=["user_id", "timestamp"])
+
+        # Keep the timestamps as int64 nanoseconds too, for the integer window arithmetic in the rules
+        transactions["ts_ns"] = transactions["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+        # Keep track of which rule flagged which row, one column per rule
+        reasons = np.zeros((len(transactions), len(self.rules)), dtype=bool)
 
         # Loop through all fraud detection rules
-        for rule in self.rules:
-            fraud_cases = rule.check(transactions)
-            if not fraud_cases.empty:
-                fraud_reason = rule.__class__.__name__  # Get the name of the rule that flagged the transaction
-                for txn_id in fraud_cases["transaction_id"]:
-                    # Add the fraud reason to the transaction's record
-                    if txn_id not in flagged_transaction_map:
-                        flagged_transaction_map[txn_id] = []
-                    flagged_transaction_map[txn_id].append(fraud_reason)
+        for r, check in enumerate(self.rule_checks):
+            reasons[:, r] = check(transactions)
+        flagged = reasons.any(axis=1)
 
         # Extract the full transaction records that were flagged
-        flagged_transactions = transactions[transactions["transaction_id"].isin(flagged_transaction_map.keys())].copy()
+        flagged_transactions = transactions[flagged].drop(columns="ts_ns")
 
         # Add a new column to show the reasons each transaction was flagged for fraud
-        flagged_transactions["fraud_reasons"] = flagged_transactions["transaction_id"].map(flagged_transaction_map)
+        flagged_transactions["fraud_reasons"] = [self.rule_names[row].tolist() for row in reasons[flagged]]
+
+        # Put the flagged transactions back in their input order (the index holds the input positions)
+        flagged_transactions.sort_index(inplace=True)
+
+        # User IDs and merchant names go back to plain values in the output
+        flagged_transactions["user_id"] = flagged_transactions["user_id"].astype(object)
+        flagged_transactions["merchant_name"] = flagged_transactions["merchant_name"].astype(object)
 
         # Handle any infinite or missing values in the flagged transactions
         flagged_transactions.replace([np.inf, -np.inf], np.nan, inplace=True)
-        flagged_transactions.fillna("Unknown", inplace=True)
-        print(len(flagged_transactions))  # Print the number of flagged transactions
+        missing_cols = flagged_transactions.columns[flagged_transactions.isna().any()]
+        flagged_transactions[missing_cols] = flagged_transactions[missing_cols].fillna("Unknown")
+        logger.debug("Flagged %d transactions", len(flagged_transactions))
 
         # Return the final list of flagged transactions with reasons
         return flagged_transactions.reset_index(drop=True)
\ No newline at end of file
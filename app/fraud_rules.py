@@ -1,56 +1,83 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
-from datetime import timedelta
+from app._kernels import window_stats
 from app.config import FRAUDULENT_MERCHANTS, WHITELIST_MERCHANTS, USER_CREDIT_LIMITS
 
+def _window_stats(transactions: pd.DataFrame, key: str, window: str, include_ties: bool = True):
+    """
+    Counts and sums each row's trailing time window per `key` with the compiled window kernel.
+
+    `key` must be a categorical column and `transactions` must be sorted by it and time.
+    With `include_ties`, rows sharing a timestamp all see the whole tie, like a scan of every row
+    with a timestamp up to the current one would.
+    """
+    return window_stats(
+        transactions[key].cat.codes.to_numpy(dtype=np.int32),
+        transactions["ts_ns"].to_numpy(),
+        transactions["amount"].to_numpy(dtype=np.float64),
+        pd.Timedelta(window).value,
+        include_ties,
+    )
+
+
+def _merchant_mask(merchants: pd.Series, names) -> np.ndarray:
+    """
+    Boolean mask of the rows whose merchant is in `names`.
+
+    `merchants` is categorical, so only the distinct merchant names are looked up in `names`
+    and the result is broadcast to the rows through the integer category codes.
+    """
+    in_names = merchants.cat.categories.isin(names)
+    return in_names[merchants.cat.codes.to_numpy()]
+
+
 class FraudRule(ABC):
     """Base class for all fraud detection rules."""
 
     @abstractmethod
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
-        """Look for suspicious transactions and flag them."""
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
+        """
+        Look for suspicious transactions and return a boolean mask of the flagged rows.
+
+        Rules can assume the timestamps are already parsed (with int64 nanoseconds in "ts_ns"),
+        user IDs and merchant names are categorical and the transactions are sorted by user and time
+        (see FraudDetector.detect_fraud). They must not modify the frame.
+        """
         pass
 
 
 class HighAmountRule(FraudRule):
     """Flags transactions that exceed an unusually high amount threshold - $10000"""
 
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
         # Set the threshold to an unusually high amount (e.g., $10,000)
         threshold = 10000
-        return transactions[transactions["amount"] > threshold]
+        return transactions["amount"].to_numpy() > threshold
 
 class TotalSpendingRule(FraudRule):
     """Flags users who spend over $50000 in a 24-hour period."""
 
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
-        # Convert timestamp to datetime for better processing
-        transactions["timestamp"] = pd.to_datetime(transactions["timestamp"])
-
-        # Sort transactions by user and time to check for spending over time
-        transactions = transactions.sort_values(by=["user_id", "timestamp"])
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
+        # Calculate 24-hour spending for each user.
+        # Transactions are already sorted by user and time, so the sums line up positionally.
+        # Only the amounts get indexed by time, instead of copying the whole frame with set_index.
+        amounts = pd.Series(transactions["amount"].to_numpy(), index=transactions["timestamp"])
+        spent_24h = (
+            amounts.groupby(transactions["user_id"].cat.codes.to_numpy(), sort=False)
+            .rolling("1d", min_periods=1)
+            .sum()
+        )
 
-        # Calculate 24-hour spending for each user
-        def calculate_24h_spent(group):
-            group = group.copy()  # Avoid warnings by making a copy
-            group = group.set_index("timestamp")
-            group["24h_spent"] = group["amount"].rolling("1d", min_periods=1).sum()
-            return group.reset_index()
-
-        # Apply the spending calculation per user
-        transactions = transactions.groupby("user_id", group_keys=False).apply(calculate_24h_spent)
-
-        # Flag transactions where the 24-hour spending exceeds $5000
-        flagged_transactions = transactions[transactions["24h_spent"] > 50000]
-
-        return flagged_transactions
+        # Flag transactions where the 24-hour spending exceeds $50000
+        return spent_24h.to_numpy() > 50000
 
 
 class FraudulentMerchantRule(FraudRule):
     """Flags transactions that are made at known fraudulent merchants."""
 
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
-        return transactions[transactions["merchant_name"].isin(FRAUDULENT_MERCHANTS)]
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
+        return _merchant_mask(transactions["merchant_name"], FRAUDULENT_MERCHANTS)
 
 
 # class MerchantMismatchRule(FraudRule):
@@ -75,133 +102,59 @@ class FraudulentMerchantRule(FraudRule):
 class HighTransactionCountRule(FraudRule):
     """Flags users who make too many transactions in a short amount of time."""
 
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
-        # Convert timestamp to datetime for easy calculations
-        transactions["timestamp"] = pd.to_datetime(transactions["timestamp"])
-        
-        # Sort by user and time so we can count transactions per user
-        transactions = transactions.sort_values(by=["user_id", "timestamp"]).reset_index(drop=True)
-        
-        results = []  # Store the flagged transactions in a list
-        
-        # Go through transactions for each user
-        for user, group in transactions.groupby("user_id"):
-            user_transactions = group.to_dict('records')
-            n = len(user_transactions)
-            left = 0
-            for i in range(n):
-                current_time = user_transactions[i]["timestamp"]
-                # Slide the left pointer to find transactions within the last hour
-                while left < i and (current_time - user_transactions[left]["timestamp"]) > timedelta(hours=1):
-                    left += 1
-                # Count all transactions in the last hour (inclusive)
-                txn_count = i - left + 1
-                user_transactions[i]["txn_count"] = txn_count
-            results.extend(user_transactions)
-        
-        result_df = pd.DataFrame(results)
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
+        # Count each user's transactions in the last hour (inclusive)
+        txn_count, _ = _window_stats(transactions, "user_id", "1h", include_ties=False)
         
         # Flag transactions if there are more than 10 in an hour
-        flagged = result_df[result_df["txn_count"] > 10]
-        return flagged
+        return txn_count > 10
 
 class WhitelistMerchantRule(FraudRule):
     """Flags non-whitelisted merchants with excessive transactions within an hour."""
 
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
-        # Focus on transactions made at non-whitelisted merchants
-        non_whitelisted = transactions[~transactions["merchant_name"].isin(WHITELIST_MERCHANTS)]
-        non_whitelisted = non_whitelisted.copy()
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
+        # Focus on transactions made at non-whitelisted merchants, taking just the arrays the window
+        # kernel needs rather than copying the frame
+        positions = np.flatnonzero(~_merchant_mask(transactions["merchant_name"], WHITELIST_MERCHANTS))
+        codes = transactions["merchant_name"].cat.codes.to_numpy(dtype=np.int32)[positions]
+        ts_ns = transactions["ts_ns"].to_numpy()[positions]
+        amount = transactions["amount"].to_numpy(dtype=np.float64)[positions]
 
-        # Ensure timestamps are in the correct format
-        non_whitelisted["timestamp"] = pd.to_datetime(non_whitelisted["timestamp"])
+        # Order by merchant and timestamp to analyze trends (lexsort is stable, like the user/time order)
+        order = np.lexsort((ts_ns, codes))
 
-        # Sort by merchant and timestamp to analyze trends
-        non_whitelisted = non_whitelisted.sort_values(by=["merchant_name", "timestamp"]).reset_index(drop=True)
-
-        # Initialize a column to count transactions
-        non_whitelisted["txn_count"] = 0  
-
-        # Function to calculate the transaction count in the last hour for each merchant
-        def count_recent_txns(group):
-            txn_counts = []
-            for i in range(len(group)):
-                start_time = group.iloc[i]["timestamp"] - pd.Timedelta(hours=1)
-                txn_counts.append(group[(group["timestamp"] >= start_time) & (group["timestamp"] <= group.iloc[i]["timestamp"])].shape[0])
-            group["txn_count"] = txn_counts
-            return group
-
-        # Apply the function to each merchant group
-        non_whitelisted = non_whitelisted.groupby("merchant_name", group_keys=False).apply(count_recent_txns)
+        # Count each merchant's transactions in the last hour (inclusive)
+        txn_count, _ = window_stats(codes[order], ts_ns[order], amount[order], pd.Timedelta("1h").value, True)
 
         # Flag transactions if there are 100 or more in the last hour at a non-whitelisted merchant
-        flagged_transactions = non_whitelisted[non_whitelisted["txn_count"] >= 100]
-
-        return flagged_transactions
+        mask = np.zeros(len(transactions), dtype=bool)
+        mask[positions[order]] = txn_count >= 100
+        return mask
 
 
 class RapidFireTransactionRule(FraudRule):
     """Flags users who make 5 or more transactions within a 1-minute window."""
 
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
-        # Convert timestamps to datetime to perform time calculations
-        transactions["timestamp"] = pd.to_datetime(transactions["timestamp"])
-
-        # Sort transactions by user and time
-        transactions = transactions.sort_values(by=["user_id", "timestamp"]).reset_index(drop=True)
-
-        # Initialize transaction count column
-        transactions["txn_count"] = 0  
-
-        # Count transactions in the last minute for each user
-        def count_recent_txns(group):
-            txn_counts = []
-            for i in range(len(group)):
-                start_time = group.iloc[i]["timestamp"] - pd.Timedelta(minutes=1)
-                txn_counts.append(group[(group["timestamp"] >= start_time) & (group["timestamp"] <= group.iloc[i]["timestamp"])].shape[0])
-            group["txn_count"] = txn_counts
-            return group
-
-        # Apply the function to each user
-        transactions = transactions.groupby("user_id", group_keys=False).apply(count_recent_txns)
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
+        # Count transactions in the last minute (inclusive) for each user
+        txn_count, _ = _window_stats(transactions, "user_id", "1min")
 
         # Flag transactions if the count in the last minute is 5 or more
-        flagged_transactions = transactions[transactions["txn_count"] >= 5]
-
-        return flagged_transactions
+        return txn_count >= 5
 
 
 class CreditLimitRule(FraudRule):
     """Flags users whose spending exceeds 30% of their credit limit in a single day."""
 
-    def check(self, transactions: pd.DataFrame) -> pd.DataFrame:
-        transactions["timestamp"] = pd.to_datetime(transactions["timestamp"])
-
-        # Sort by user and time to analyze spending
-        transactions = transactions.sort_values(by=["user_id", "timestamp"]).reset_index(drop=True)
-
-        # Initialize a column for daily spend
-        transactions["daily_spend"] = 0  
-
-        # Function to calculate daily spend for each user
-        def calculate_24h_spend(group):
-            daily_spend_values = []
-            for i in range(len(group)):
-                start_time = group.iloc[i]["timestamp"] - pd.Timedelta(days=1)
-                daily_spend_values.append(group[(group["timestamp"] >= start_time) & 
-                                                (group["timestamp"] <= group.iloc[i]["timestamp"])]["amount"].sum())
-            group["daily_spend"] = daily_spend_values
-            return group
-
-        # Apply the spend calculation per user
-        transactions = transactions.groupby("user_id", group_keys=False).apply(calculate_24h_spend)
-
-        # Function to check if daily spend exceeds 30% of the credit limit
-        def exceeds_credit_limit(row):
-            user_limit = USER_CREDIT_LIMITS.get(row["user_id"], 5000)  # Default to $5000 if no limit set
-            return row["daily_spend"] > (0.3 * user_limit)
+    def check_mask(self, transactions: pd.DataFrame) -> np.ndarray:
+        # Calculate the trailing 24-hour (inclusive) spend for each user
+        _, daily_spend = _window_stats(transactions, "user_id", "1d")
 
-        # Flag transactions where the daily spend exceeds the limit
-        flagged_transactions = transactions[transactions.apply(exceeds_credit_limit, axis=1)]
+        # Look up each distinct user's credit limit, defaulting to $5000 if no limit is set,
+        # and spread the limits to the rows through the category codes
+        user_ids = transactions["user_id"]
+        limits_per_code = np.array([USER_CREDIT_LIMITS.get(user, 5000) for user in user_ids.cat.categories])
+        limits = np.take(limits_per_code, user_ids.cat.codes.to_numpy())
 
-        return flagged_transactions
+        # Flag transactions where the daily spend exceeds 30% of the credit limit
+        return daily_spend > 0.3 * limits
@@ -2,12 +2,14 @@
 
 from fastapi import FastAPI, HTTPException, File, UploadFile, Depends
 from app.models import MerchantRequest, UserCreditLimitRequest, FraudDetectionRequest
-from app.fraud_detector import FraudDetector
+from app.fraud_detector import FraudDetector, InvalidTransactionsError
 from app.config import FRAUDULENT_MERCHANTS, WHITELIST_MERCHANTS, USER_CREDIT_LIMITS
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import threading
 import json
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 
 app = FastAPI()
 fraud_detector = FraudDetector()
@@ -75,20 +77,45 @@ def update_user_credit_limit(request: UserCreditLimitRequest):
     return {"message": f"Credit limit updated for user {user_id}"}
 
 ### Fraud Detection
+def read_transactions_csv(file) -> pd.DataFrame:
+    """
+    Reads an uploaded CSV with pyarrow's multi-threaded parser.
+
+    pyarrow infers dates and times for every column that looks like one, but only "timestamp" is
+    meant to be parsed. Any other such column is read again as plain text, the way pandas'
+    default parser leaves it.
+    """
+    convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+    table = pa_csv.read_csv(file, convert_options=convert_options)
+
+    temporal_cols = [
+        field.name for field in table.schema
+        if field.name != "timestamp" and pa.types.is_temporal(field.type)
+    ]
+    if temporal_cols:
+        file.seek(0)
+        convert_options.column_types = {name: pa.string() for name in temporal_cols}
+        table = pa_csv.read_csv(file, convert_options=convert_options)
+
+    return table.to_pandas()
+
+
 @app.post("/detect_fraud")
 def detect_fraud(file: UploadFile = File(...)):
     try:
-        transactions = pd.read_csv(file.file)
+        transactions = read_transactions_csv(file.file)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid CSV file format")
     
-    flagged_transactions = fraud_detector.detect_fraud(transactions)    
+    try:
+        flagged_transactions = fraud_detector.detect_fraud(transactions)
+    except InvalidTransactionsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Convert Timestamp columns to strings
     flagged_transactions["timestamp"] = flagged_transactions["timestamp"].astype(str)
     
-    # Convert DataFrame to a list of dictionaries and format it as a pretty JSON string
-    response_data = flagged_transactions.to_dict(orient="records")
+    # Serialize the DataFrame to JSON in one go, without building a dictionary per row first
+    response_data = flagged_transactions.to_json(orient="records", date_format="iso", double_precision=15)
 
-    
-    return JSONResponse(content=response_data)
+    return Response(content=response_data, media_type="application/json")
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.fraud_detector import FraudDetector, InvalidTransactionsError
+
+
+def make_transactions(rows, index=None):
+    return pd.DataFrame(rows, columns=["user_id", "timestamp", "merchant_name", "amount"], index=index)
+
+
+def test_missing_columns_are_reported():
+    transactions = pd.DataFrame({"user_id": ["U1"], "amount": [1.0]})
+
+    with pytest.raises(InvalidTransactionsError, match="timestamp, merchant_name"):
+        FraudDetector().detect_fraud(transactions)
+
+
+def test_missing_timestamps_are_reported():
+    transactions = make_transactions([("U1", None, "Walmart", 1.0), ("U1", "2025-01-01 10:00:00", "Walmart", 1.0)])
+
+    with pytest.raises(InvalidTransactionsError, match="timestamps"):
+        FraudDetector().detect_fraud(transactions)
+
+
+def test_empty_batch():
+    flagged = FraudDetector().detect_fraud(make_transactions([]))
+
+    assert flagged.empty
+    assert "fraud_reasons" in flagged.columns
+
+
+def test_missing_amount_counts_as_zero():
+    transactions = make_transactions([
+        ("U1", "2025-01-01 10:00:00", "ScamStore", np.nan),
+        ("U1", "2025-01-01 11:00:00", "Walmart", 20000.0),
+    ])
+
+    flagged = FraudDetector().detect_fraud(transactions)
+
+    assert flagged["amount"].tolist() == [0.0, 20000.0]
+    assert flagged["fraud_reasons"].tolist() == [
+        ["FraudulentMerchantRule"],
+        ["HighAmountRule", "CreditLimitRule"],
+    ]
+
+
+def test_numeric_user_ids_with_blanks():
+    transactions = make_transactions([
+        (123, "2025-01-01 10:00:00", "Walmart", 1600.0),
+        (np.nan, "2025-01-01 10:00:00", "Walmart", 1600.0),
+        (456, "2025-01-01 10:00:00", "Walmart", 100.0),
+    ])
+
+    flagged = FraudDetector().detect_fraud(transactions)
+
+    # The blank user is "Unknown" and gets the default $5000 limit, like everyone else here
+    assert flagged["user_id"].tolist() == [123, "Unknown"]
+    assert flagged["fraud_reasons"].tolist() == [["CreditLimitRule"], ["CreditLimitRule"]]
+
+
+def test_all_user_ids_blank():
+    transactions = make_transactions([(np.nan, "2025-01-01 10:00:00", "Walmart", 1600.0)])
+
+    flagged = FraudDetector().detect_fraud(transactions)
+
+    assert flagged["user_id"].tolist() == ["Unknown"]
+    assert flagged["fraud_reasons"].tolist() == [["CreditLimitRule"]]
+
+
+def test_flagged_rows_keep_input_order_and_reasons():
+    rapid_fire = [("U4", f"2025-01-01 12:00:{10 * k:02d}", "Walmart", 1.0) for k in range(5)]
+    rows = [
+        ("U3", "2025-01-01 09:00:00", "Walmart", 10.0),
+        ("U2", "2025-01-01 08:00:00", "Walmart", 20000.0),
+        *reversed(rapid_fire),
+        ("U1", "2025-01-01 07:00:00", "ScamStore", 50.0),
+    ]
+    # An unordered index with duplicates: input order is positional, not by label
+    transactions = make_transactions(rows, index=[9, 3, 3, 7, 0, 5, 1, 2])
+
+    flagged = FraudDetector().detect_fraud(transactions)
+
+    assert flagged["user_id"].tolist() == ["U2", "U4", "U1"]
+    assert flagged["timestamp"].astype(str).tolist() == [
+        "2025-01-01 08:00:00",
+        "2025-01-01 12:00:40",
+        "2025-01-01 07:00:00",
+    ]
+    assert flagged["fraud_reasons"].tolist() == [
+        ["HighAmountRule", "CreditLimitRule"],
+        ["RapidFireTransactionRule"],
+        ["FraudulentMerchantRule"],
+    ]
+    assert flagged.index.tolist() == [0, 1, 2]
+
+
+def test_input_frame_only_gains_transaction_ids():
+    transactions = make_transactions([
+        (123, "2025-01-01 10:00:00", "Walmart", 20000.0),
+        (np.nan, "2025-01-01 09:00:00", None, np.nan),
+    ], index=[5, 2])
+    original = transactions.copy()
+
+    FraudDetector().detect_fraud(transactions)
+
+    assert "transaction_id" in transactions.columns
+    pd.testing.assert_frame_equal(transactions.drop(columns="transaction_id"), original)
+
+def test_sample_batch():
+    transactions = pd.read_csv("combined_transactions.csv")
+
+    flagged = FraudDetector().detect_fraud(transactions)
+
+    assert len(flagged) == 21
+    assert flagged["fraud_reasons"].map(tuple).value_counts().to_dict() == {
+        ("CreditLimitRule",): 15,
+        ("RapidFireTransactionRule", "CreditLimitRule"): 6,
+    }
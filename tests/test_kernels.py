@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+
+from app._kernels import window_stats
+
+DAY_NS = 86400 * 10**9
+
+
+def brute_force_window_stats(group_codes, ts_ns, amount, window_ns, include_ties):
+    """Scans every row for each window, summing exactly with math.fsum."""
+    counts, sums = [], []
+    for i in range(len(ts_ns)):
+        rows = [
+            j for j in range(len(ts_ns))
+            if group_codes[j] == group_codes[i]
+            and ts_ns[i] - window_ns <= ts_ns[j] <= ts_ns[i]
+            and (include_ties or j <= i)
+        ]
+        counts.append(len(rows))
+        sums.append(math.fsum(amount[rows]))
+    return np.array(counts), np.array(sums)
+
+
+def random_transactions(rng, n):
+    """Random transactions sorted by group and time, with plenty of timestamp ties."""
+    group_codes = np.sort(rng.integers(0, 3, n)).astype(np.int32)
+    ts_ns = np.empty(n, dtype=np.int64)
+    for code in np.unique(group_codes):
+        rows = np.flatnonzero(group_codes == code)
+        ts_ns[rows] = np.sort(rng.integers(0, 8, len(rows))) * (DAY_NS // 3)
+    amount = np.round(rng.uniform(0, 2000, n), 2)
+    return group_codes, ts_ns, amount
+
+
+def test_window_stats_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        group_codes, ts_ns, amount = random_transactions(rng, int(rng.integers(1, 40)))
+        for include_ties in (False, True):
+            counts, sums = window_stats(group_codes, ts_ns, amount, DAY_NS, include_ties)
+            expected_counts, expected_sums = brute_force_window_stats(
+                group_codes, ts_ns, amount, DAY_NS, include_ties
+            )
+            np.testing.assert_array_equal(counts, expected_counts)
+            np.testing.assert_allclose(sums, expected_sums, rtol=1e-13, atol=1e-9)
+
+
+def test_window_stats_ties():
+    group_codes = np.zeros(5, dtype=np.int32)
+    ts_ns = np.array([0, 10, 10, 10, 20], dtype=np.int64)
+    amount = np.ones(5)
+
+    counts, _ = window_stats(group_codes, ts_ns, amount, 10, False)
+    np.testing.assert_array_equal(counts, [1, 2, 3, 4, 4])
+
+    counts, sums = window_stats(group_codes, ts_ns, amount, 10, True)
+    np.testing.assert_array_equal(counts, [1, 4, 4, 4, 4])
+    np.testing.assert_array_equal(sums, [1.0, 4.0, 4.0, 4.0, 4.0])
+
+
+def test_window_stats_no_rounding_error_from_expired_rows():
+    # These amounts don't add up exactly in floating point, but they have all left the window
+    # by the time of the last purchase, whose window sum must be exactly 1500
+    group_codes = np.zeros(6, dtype=np.int32)
+    ts_ns = np.array([1, 2, 3, 4, 5, 72], dtype=np.int64) * 3600 * 10**9
+    amount = np.array([14.12, 67.01, 71.46, 16.71, 39.56, 1500.00])
+
+    _, sums = window_stats(group_codes, ts_ns, amount, DAY_NS, True)
+    assert sums[-1] == 1500.0
+    assert not sums[-1] > 0.3 * 5000
+
+
+def test_window_stats_threshold_equality():
+    # Amounts that are exact in binary, so the window sums hit the $1500 threshold exactly
+    group_codes = np.zeros(7, dtype=np.int32)
+    ts_ns = np.array([0, 1, 2, 3, 25, 26, 27], dtype=np.int64) * 3600 * 10**9
+    amount = np.array([0.25, 999.75, 250.5, 249.5, 0.75, 1000.0, 249.75])
+
+    _, sums = window_stats(group_codes, ts_ns, amount, DAY_NS, True)
+    np.testing.assert_array_equal(sums, [0.25, 1000.0, 1250.5, 1500.0, 1500.5, 1500.75, 1500.0])
+    assert not (sums[[3, 6]] > 1500).any()
@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def detect_fraud(csv: str):
+    return client.post("/detect_fraud", files={"file": ("transactions.csv", csv.encode(), "text/csv")})
+
+
+def test_detect_fraud_keeps_extra_date_columns_as_text():
+    response = detect_fraud(
+        "user_id,timestamp,merchant_name,amount,created\n"
+        "U1,2025-01-01 10:00:00,ScamStore,20.0,2025-01-01\n"
+    )
+
+    assert response.status_code == 200
+    [row] = response.json()
+    assert row["created"] == "2025-01-01"
+    assert row["timestamp"] == "2025-01-01 10:00:00"
+
+
+def test_detect_fraud_keeps_full_float_precision():
+    response = detect_fraud(
+        "user_id,timestamp,merchant_name,amount\n"
+        "U1,2025-01-01 10:00:00,ScamStore,20000.123456789012\n"
+    )
+
+    assert response.status_code == 200
+    assert response.json()[0]["amount"] == 20000.123456789012
+
+
+def test_detect_fraud_missing_columns():
+    response = detect_fraud("user_id,timestamp,amount\nU1,2025-01-01 10:00:00,5\n")
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Missing required columns: merchant_name"}
+
+
+def test_detect_fraud_blank_timestamp():
+    response = detect_fraud(
+        "user_id,timestamp,merchant_name,amount\n"
+        "U1,,Walmart,5\n"
+        "U1,2025-01-01 10:00:00,Walmart,5\n"
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Transactions have missing or invalid timestamps"}
+
+
+def test_detect_fraud_empty_batch():
+    response = detect_fraud("user_id,timestamp,merchant_name,amount\n")
+
+    assert response.status_code == 200
+    assert response.json() == []